@@ -0,0 +1,40 @@
+# app/cache_http.py
+import hashlib
+import json
+from fastapi import Request, Response
+
+
+def calcular_etag(*partes, debil=False) -> str:
+    """
+    ETag a partir de las partes que determinan la respuesta
+    (ej. versión de catálogo + parámetros de la consulta).
+    Usar debil=True si el cuerpo no es idéntico byte a byte entre
+    respuestas equivalentes (RFC 9110 §8.8.1).
+    """
+    h = hashlib.sha256()
+    for parte in partes:
+        if not isinstance(parte, (str, bytes)):
+            parte = json.dumps(parte, sort_keys=True, default=str)
+        if isinstance(parte, str):
+            parte = parte.encode()
+        h.update(parte)
+        h.update(b"\x00")
+    etag = f'"{h.hexdigest()[:32]}"'
+    return f"W/{etag}" if debil else etag
+
+
+def etag_coincide(request: Request, etag: str) -> bool:
+    """
+    Evalúa If-None-Match (RFC 9110: comparación débil, acepta listas y '*').
+    """
+    encabezado = request.headers.get("if-none-match")
+    if not encabezado:
+        return False
+    if encabezado.strip() == "*":
+        return True
+    candidatos = [c.strip().removeprefix("W/") for c in encabezado.split(",")]
+    return etag.removeprefix("W/") in candidatos
+
+
+def no_modificado(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
@@ -1,9 +1,17 @@
 import pandas as pd
+import numpy as np
 import os
+import json
+import hashlib
 
 # Ruta base de los datos
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
+ARCHIVOS_CATALOGO = [
+    'paneles.csv', 'inversores.csv', 'cables_dc.csv', 'cables_ac.csv',
+    'precios_materiales.csv', 'precios_mano_de_obra.csv', 'precios_indirectos.csv',
+]
+
 class Database:
     _instance = None
 
@@ -57,10 +65,62 @@ class Database:
             self.inversores = pd.read_csv(os.path.join(DATA_DIR, 'inversores.csv')).set_index('Modelo')
         finally:
             print("Carga de paneles y inversores completada.")
+
+        self.version_catalogo = self.calcular_version_catalogo()
+        self.indices_listos = False
+
+    def calcular_version_catalogo(self):
+        # Hash de los CSVs: cambia solo si cambia algún dato del catálogo
+        h = hashlib.sha256()
+        for archivo in ARCHIVOS_CATALOGO:
+            ruta = os.path.join(DATA_DIR, archivo)
+            if os.path.exists(ruta):
+                with open(ruta, 'rb') as f:
+                    h.update(f.read())
+        return h.hexdigest()[:16]
+
+    def construir_indices(self):
+        """
+        Pre-construye diccionarios de búsqueda por modelo. Evita pagar
+        DataFrame.loc (y la creación de una Series) en cada cotización.
+        """
+        self._idx_paneles = self.paneles.to_dict('index')
+        self._idx_inversores = self.inversores.to_dict('index')
+
+        # Para búsquedas del catálogo: registros listos para JSON y, por cada
+        # columna numérica, (valores ordenados, posición original de cada valor)
+        self.registros_catalogo = {}
+        self.indices_columnas = {}
+        for tabla, df in (('paneles', self.paneles), ('inversores', self.inversores)):
+            self.registros_catalogo[tabla] = json.loads(df.reset_index().to_json(orient='records'))
+            self.indices_columnas[tabla] = {}
+            for columna in df.select_dtypes(include='number').columns:
+                valores = df[columna].to_numpy(dtype=float)
+                posiciones = np.argsort(valores, kind='stable')
+                self.indices_columnas[tabla][columna] = (valores[posiciones], posiciones)
+
+        # Tramos de precio por volumen: {SKU: [(cantidad_minima, costo), ...]} ordenados
+        self.tramos_volumen = {}
+        columnas_volumen = sorted(c for c in self.precios_materiales.columns if c.startswith('Volumen_'))
+        for sku, fila in self.precios_materiales.iterrows():
+            tramos = [
+                (float(fila[c]), float(fila[f'Costo_{c}']))
+                for c in columnas_volumen
+                if pd.notna(fila[c]) and pd.notna(fila.get(f'Costo_{c}'))
+            ]
+            if tramos:
+                self.tramos_volumen[sku] = sorted(tramos)
+
+        self.indices_listos = True
+
     def get_panel(self, modelo):
+        if self.indices_listos:
+            return self._idx_paneles[modelo]
         return self.paneles.loc[modelo]
 
     def get_inversor(self, modelo):
+        if self.indices_listos:
+            return self._idx_inversores[modelo]
         return self.inversores.loc[modelo]
         
     # Helpers para obtener listas de calibres ordenados
@@ -1,13 +1,33 @@
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse
 from datetime import datetime
-from app.models import ProyectoInput, DatosClimaticos, ProyectoOutput, ResumenCostos, ReporteGeneral
-from app.services.dc_service import calcular_circuito_dc
-from app.services.ac_service import calcular_circuito_ac
-from app.services.costing_service import generar_reporte_costos
-from app.services.weather_service import obtener_datos_nasa
+from typing import Literal, Optional
+from app.database import db
+from app.cache_http import calcular_etag, etag_coincide, no_modificado
+from app.models import ProyectoInput, DatosClimaticos, ProyectoOutput, ResumenCostos, ReporteGeneral, PortafolioOutput
+from app.services.cotizacion_service import parsear_coordenadas, resolver_clima, calcular_cotizacion
+from app.services.weather_service import obtener_datos_nasa, celda_nasa
+from app.services.temperaturas_diseno_service import obtener_temperaturas_percentil
+from app.services.warmup_service import calentar, reporte_salud
+from app.services.catalog_service import buscar_catalogo, LIMITE_MAXIMO
+from app.services.portfolio_service import consolidar_ndjson
+from app.services.cotizacion_en_vivo_service import SesionCotizacion
+from app.perfilador import PERFILADOR_HABILITADO, MiddlewarePerfilador, perfilador, token_valido
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Costeador Finsolar API", version="1.1")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El calentamiento corre en segundo plano: el puerto abre de inmediato
+    # pero /health/ready responde 503 hasta que termine.
+    tarea_calentamiento = asyncio.create_task(calentar())
+    yield
+    tarea_calentamiento.cancel()
+
+
+app = FastAPI(title="Costeador Finsolar API", version="1.1", lifespan=lifespan)
 
 # Configuración Permisiva para Desarrollo
 app.add_middleware(
@@ -18,83 +38,191 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Perfilador por muestreo (opt-in con PERFILADOR_HABILITADO=1, ver app/perfilador.py)
+if PERFILADOR_HABILITADO:
+    app.add_middleware(MiddlewarePerfilador)
+
+# --- Salud (para el orquestador) ---
+@app.get("/health/live")
+async def health_live():
+    """El proceso está vivo (no implica que esté listo para tráfico)."""
+    return {"estatus": "vivo"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    200 solo cuando el calentamiento terminó (catálogo indexado y clima
+    pre-cargado). Incluye versión de catálogo, tamaño de caché y estado de NASA.
+    """
+    reporte = reporte_salud()
+    return JSONResponse(status_code=200 if reporte["listo"] else 503, content=reporte)
+
+# --- Administración: perfiles de peticiones lentas ---
+def _validar_admin(request: Request):
+    # Sin perfilador o sin token configurado, los endpoints no existen
+    if not PERFILADOR_HABILITADO or not token_valido(request.headers.get("x-admin-token", "")):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/admin/perfiles")
+async def listar_perfiles(request: Request):
+    """Últimos perfiles capturados (sin pilas ni entrada)."""
+    _validar_admin(request)
+    return perfilador.listar()
+
+@app.get("/admin/perfiles/{id_perfil}")
+async def obtener_perfil(id_perfil: str, request: Request):
+    """Perfil completo: metadatos, entrada redactada y pilas colapsadas."""
+    _validar_admin(request)
+    perfil = perfilador.obtener(id_perfil)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return perfil
+
+@app.get("/admin/perfiles/{id_perfil}/colapsado", response_class=PlainTextResponse)
+async def descargar_perfil(id_perfil: str, request: Request):
+    """Pilas colapsadas listas para flamegraph.pl / speedscope."""
+    _validar_admin(request)
+    perfil = perfilador.obtener(id_perfil)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return PlainTextResponse(
+        perfil["colapsado"] + "\n",
+        headers={"Content-Disposition": f'attachment; filename="perfil_{id_perfil}.folded"'},
+    )
+
+# --- Catálogo ---
+CACHE_CONTROL_CATALOGO = "public, max-age=300"
+
+def _responder_catalogo(request: Request, tabla, filtros, orden, desc, limite, cursor):
+    # El ETag depende solo de la versión del catálogo y de la consulta,
+    # así que un 304 se puede contestar sin tocar los índices.
+    etag = calcular_etag(db.version_catalogo, tabla, sorted(filtros.items()), orden, desc, limite, cursor)
+    if etag_coincide(request, etag):
+        return no_modificado(etag, CACHE_CONTROL_CATALOGO)
+    try:
+        resultado = buscar_catalogo(tabla, filtros, orden, desc, limite, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=resultado, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL_CATALOGO})
+
+@app.get("/api/v1/catalogo/inversores")
+async def catalogo_inversores(
+    request: Request,
+    potencia_min: Optional[float] = Query(None, description="PotenciaSalidaAC mínima (W)"),
+    potencia_max: Optional[float] = Query(None, description="PotenciaSalidaAC máxima (W)"),
+    vdc_min: Optional[float] = Query(None, description="MaxVoltajeEntradaDC mínimo (V)"),
+    vdc_max: Optional[float] = Query(None, description="MaxVoltajeEntradaDC máximo (V)"),
+    mppt_desde: Optional[float] = Query(None, description="La ventana MPPT debe iniciar en o por debajo de este voltaje"),
+    mppt_hasta: Optional[float] = Query(None, description="La ventana MPPT debe llegar hasta este voltaje"),
+    vff: Optional[float] = Query(None, description="Voltaje de línea exacto (V)"),
+    costo_min: Optional[float] = Query(None),
+    costo_max: Optional[float] = Query(None),
+    orden: Optional[Literal["PotenciaSalidaAC", "Imax_CA", "MaxVoltajeEntradaDC", "MPPT_Min", "MPPT_Max", "Vff", "Costo"]] = None,
+    desc: bool = False,
+    limite: int = Query(20, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+):
+    """Lista inversores con filtros por rango, orden y paginación por cursor."""
+    filtros = {
+        "PotenciaSalidaAC": (potencia_min, potencia_max),
+        "MaxVoltajeEntradaDC": (vdc_min, vdc_max),
+        "MPPT_Min": (None, mppt_desde),
+        "MPPT_Max": (mppt_hasta, None),
+        "Vff": (vff, vff),
+        "Costo": (costo_min, costo_max),
+    }
+    return _responder_catalogo(request, "inversores", filtros, orden, desc, limite, cursor)
+
+@app.get("/api/v1/catalogo/paneles")
+async def catalogo_paneles(
+    request: Request,
+    pmax_min: Optional[float] = Query(None, description="Pmax mínima (W)"),
+    pmax_max: Optional[float] = Query(None, description="Pmax máxima (W)"),
+    voc_min: Optional[float] = Query(None),
+    voc_max: Optional[float] = Query(None),
+    isc_min: Optional[float] = Query(None),
+    isc_max: Optional[float] = Query(None),
+    costo_min: Optional[float] = Query(None),
+    costo_max: Optional[float] = Query(None),
+    orden: Optional[Literal["Pmax", "Vmp", "Imp", "Voc", "Isc", "CoefTempVoc", "Costo"]] = None,
+    desc: bool = False,
+    limite: int = Query(20, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+):
+    """Lista paneles con filtros por rango, orden y paginación por cursor."""
+    filtros = {
+        "Pmax": (pmax_min, pmax_max),
+        "Voc": (voc_min, voc_max),
+        "Isc": (isc_min, isc_max),
+        "Costo": (costo_min, costo_max),
+    }
+    return _responder_catalogo(request, "paneles", filtros, orden, desc, limite, cursor)
+
+# --- Caché HTTP de clima y cotizaciones ---
+# El clima NASA es climatología histórica: puede cachearse en proxies un día.
+CACHE_CONTROL_CLIMA = "public, max-age=86400"
+# Las cotizaciones son POST privados: el cliente guarda la respuesta y revalida con If-None-Match.
+CACHE_CONTROL_COSTEO = "private, no-cache"
+
 # --- NUEVO ENDPOINT ---
 @app.get("/api/v1/clima", response_model=DatosClimaticos)
 async def consultar_clima(
+    request: Request,
+    response: Response,
     lat: float = Query(..., description="Latitud decimal (ej. 19.43)"),
-    lon: float = Query(..., description="Longitud decimal (ej. -99.13)")
+    lon: float = Query(..., description="Longitud decimal (ej. -99.13)"),
+    modo: Literal["climatologia", "percentiles"] = Query("climatologia", description="Método de cálculo"),
+    percentil_min: float = Query(0.4, ge=0.1, le=99.9, description="Solo modo percentiles"),
+    percentil_max: float = Query(99.6, ge=0.1, le=99.9, description="Solo modo percentiles"),
 ):
     """
     Obtiene temperaturas críticas (Min histórica y Max promedio) 
     directamente de NASA POWER para dimensionamiento fotovoltaico.
+    En modo 'percentiles' se calculan sobre la serie diaria histórica (estilo ASHRAE).
     """
-    return await obtener_datos_nasa(lat, lon)
+    # La respuesta solo depende de la celda NASA, los parámetros y el catálogo:
+    # el 304 se contesta antes de consultar a la NASA.
+    etag = calcular_etag(
+        "clima", db.version_catalogo, celda_nasa(lat, lon), lat, lon, modo, percentil_min, percentil_max
+    )
+    if etag_coincide(request, etag):
+        return no_modificado(etag, CACHE_CONTROL_CLIMA)
+
+    if modo == "percentiles":
+        try:
+            datos = await obtener_temperaturas_percentil(lat, lon, percentil_min, percentil_max)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        datos = await obtener_datos_nasa(lat, lon)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL_CLIMA
+    return datos
 
 @app.post("/api/v1/costear-proyecto", response_model=ProyectoOutput)
-async def costear_proyecto(proyecto: ProyectoInput):
+async def costear_proyecto(proyecto: ProyectoInput, request: Request, response: Response):
+    # Misma entrada + mismo catálogo = mismo costeo, pero fecha_calculo cambia
+    # en cada respuesta: el ETag es débil (equivalencia semántica, no byte a byte).
+    # Se valida antes de cualquier llamada a la NASA o dimensionamiento.
+    etag = calcular_etag("costeo", db.version_catalogo, proyecto.model_dump(mode="json"), debil=True)
+    if etag_coincide(request, etag):
+        return no_modificado(etag, CACHE_CONTROL_COSTEO)
+
     alertas = []
     
     try:
         # 1. Parsear coordenadas
-        try:
-            lat_str, lon_str = proyecto.coordenadas.split(',')
-            lat, lon = float(lat_str.strip()), float(lon_str.strip())
-        except ValueError:
-            raise ValueError("Formato de coordenadas inválido. Use 'lat, lon'")
-
-        datos_climaticos = None
+        lat, lon = parsear_coordenadas(proyecto.coordenadas)
 
         # 2. Lógica Híbrida: Calibración vs NASA
-        usar_manual = False
-        if proyecto.calibracion_climatica and proyecto.calibracion_climatica.usar_override:
-            usar_manual = True
-            manual = proyecto.calibracion_climatica.datos_manuales
-            
-            # Verificamos que vengan los datos críticos
-            if manual.temp_min_media_mensual is not None and manual.temp_max_media_mensual is not None:
-                alertas.append({
-                    "codigo": "CLIMA-MANUAL",
-                    "mensaje": f"Usando datos manuales de: {proyecto.calibracion_climatica.fuente_datos}"
-                })
-                
-                # Mapeo de variables Conagua -> Variables de Diseño del Sistema
-                datos_climaticos = DatosClimaticos(
-                    # Para Voc usamos la mínima media reportada (4.3°C según tu ejemplo)
-                    # Nota: Podrías aplicar un margen de seguridad aquí si quisieras (ej. -2°C)
-                    temperatura_minima_historica=manual.temp_min_media_mensual,
-                    
-                    # Para Ampacidad usamos la máxima media reportada (27.8°C)
-                    temperatura_maxima_promedio=manual.temp_max_media_mensual,
-                    
-                    temperatura_promedio_anual=manual.temp_promedio_anual,
-                    ubicacion_validada=f"Manual Override ({lat}, {lon})"
-                )
-            else:
-                alertas.append({
-                    "codigo": "WARN-MANUAL-INCOMPLETO",
-                    "mensaje": "Se activó override pero faltan datos. Usando NASA como respaldo."
-                })
-                usar_manual = False
-
-        # Si no se usó manual (o faltaban datos), vamos a la NASA
-        if not usar_manual:
-            datos_climaticos = await obtener_datos_nasa(lat, lon)
-            alertas.append({
-                "codigo": "INFO-CLIMA-NASA",
-                "mensaje": f"Datos NASA: Tmin={datos_climaticos.temperatura_minima_historica}, Tmax={datos_climaticos.temperatura_maxima_promedio}"
-            })
-
-        # 3. Cálculo DC
-        res_dc = calcular_circuito_dc(proyecto, datos_climaticos, alertas)
-        
-        # 4. Cálculo AC
-        res_ac = calcular_circuito_ac(proyecto, res_dc, datos_climaticos, alertas)
-        
-        # 5. Costeo
-        resultado_final = generar_reporte_costos(
-            proyecto, res_dc, res_ac, proyecto.decision_interconexion
-        )
+        datos_climaticos = await resolver_clima(proyecto, lat, lon, alertas)
+
+        # 3-5. Cálculo DC, AC y Costeo
+        resultado_final = calcular_cotizacion(proyecto, datos_climaticos, alertas)
 
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL_COSTEO
         return ProyectoOutput(
             reporte_general=ReporteGeneral(
                 nombre_proyecto=proyecto.nombre_proyecto,
@@ -108,7 +236,41 @@ async def costear_proyecto(proyecto: ProyectoInput):
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        # Errores ya clasificados (ej. NASA no disponible) conservan su código
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+@app.websocket("/ws/v1/cotizacion-en-vivo")
+async def cotizacion_en_vivo(websocket: WebSocket):
+    """
+    Cotización en vivo para el diseñador.
+
+    Cliente -> {"tipo": "inicio", "proyecto": {...ProyectoInput}, "incluir_bom": false}
+               {"tipo": "delta", "cambios": {"diseno_dc": {"numero_de_series": 8}}}  (JSON Merge Patch)
+    Servidor -> {"tipo": "resultado", "version": n, "resumen_costos": {...}, "alertas_ingenieria": [...]}
+                {"tipo": "error", "version": n, "detalle": ...}
+
+    Las ráfagas de cambios se agrupan (debounce) y solo se calcula el estado más
+    reciente. El clima se resuelve una vez por sesión y solo se vuelve a pedir
+    si cambian las coordenadas o la configuración climática.
+    """
+    await websocket.accept()
+    await SesionCotizacion(websocket).atender()
+
+@app.post("/api/v1/portafolio/consolidar", response_model=PortafolioOutput)
+async def consolidar_portafolio(request: Request):
+    """
+    Orden de compra consolidada de un portafolio.
+
+    Recibe NDJSON (application/x-ndjson): una respuesta de costear-proyecto
+    por línea. Las BOMs se reducen por SKU conforme llega el cuerpo, se aplican
+    los tramos de volumen de precios_materiales.csv y se regresa el CAPEX del portafolio.
+    """
+    try:
+        return await consolidar_ndjson(request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
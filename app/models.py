@@ -18,6 +18,13 @@ class CalibracionClimatica(BaseModel):
     fuente_datos: str = "Manual/Conagua"
     datos_manuales: DatosManuales
 
+# --- Temperaturas de diseño por percentiles (NUEVO) ---
+class TemperaturasPercentil(BaseModel):
+    percentil_min: float = Field(0.4, ge=0.1, le=99.9, description="Percentil de T2M_MIN diaria usado para Voc")
+    percentil_max: float = Field(99.6, ge=0.1, le=99.9, description="Percentil de T2M_MAX diaria usado para ampacidad")
+    anio_inicio: int = Field(1991, ge=1981, description="Primer año de la serie diaria")
+    anio_fin: int = Field(2020, ge=1981, description="Último año de la serie diaria (a lo más el último año completo)")
+
 # --- Modelos de Entrada (Request) ---
 
 # --- Modelos Existentes (Actualizados) ---
@@ -66,6 +73,8 @@ class ProyectoInput(BaseModel):
     decision_interconexion: "DecisionInterconexion"
     # NUEVO CAMPO OPCIONAL
     calibracion_climatica: Optional[CalibracionClimatica] = None
+    # Si se envía, las temperaturas NASA se calculan por percentiles de la serie diaria
+    temperaturas_percentil: Optional[TemperaturasPercentil] = None
 
 # --- Modelos de Salida (Response) ---
 
@@ -95,3 +104,31 @@ class ProyectoOutput(BaseModel):
     BOM_detallada: List[ItemBOM]
     alertas_ingenieria: List[dict] = []
 
+
+
+# --- Modelos de Portafolio (Compras consolidadas) ---
+
+class ItemConsolidado(BaseModel):
+    item: str
+    especificacion: str
+    unidad: str
+    cantidad: float
+    proyectos: int = Field(..., description="Número de proyectos que incluyen la partida")
+    precio_lista: float
+    precio_unitario: float = Field(..., description="Precio aplicado tras tramos de volumen")
+    tramo_volumen: Optional[float] = Field(None, description="Cantidad mínima del tramo aplicado")
+    costo_total: float
+    ahorro_volumen: float
+
+class ResumenPortafolio(BaseModel):
+    proyectos: int
+    partidas: int
+    Costo_Materiales_Lista: float
+    Costo_Materiales_Volumen: float
+    Ahorro_Volumen: float
+    CAPEX_Proyectos: float = Field(..., description="Suma de CAPEX_Final de los proyectos recibidos")
+    CAPEX_Portafolio: float = Field(..., description="CAPEX_Proyectos menos el ahorro por volumen (con márgenes)")
+
+class PortafolioOutput(BaseModel):
+    resumen: ResumenPortafolio
+    BOM_consolidada: List[ItemConsolidado]
@@ -0,0 +1,216 @@
+# app/perfilador.py
+"""
+Perfilador por muestreo bajo demanda (opt-in).
+
+Un hilo toma muestras de la pila (sys._current_frames) del hilo que atiende
+la petición cada PERFILADOR_INTERVALO_MS. Solo se muestrea mientras hay
+peticiones perfilables en curso, así que el costo en reposo es cero.
+
+Disparadores:
+  - Encabezado 'X-Perfilar: <PERFILADOR_TOKEN>' en la petición.
+  - Latencia >= PERFILADOR_UMBRAL_MS (si > 0): se muestrean todas las peticiones
+    /api/ y se conserva el perfil solo de las lentas.
+
+Se guardan los últimos PERFILADOR_MAX_PERFILES perfiles en formato
+"collapsed stacks" (flamegraph.pl, speedscope, inferno) junto con la entrada redactada.
+
+Nota: los endpoints async comparten el hilo del event loop; si hay peticiones
+concurrentes, el perfil de una incluye muestras del trabajo de las demás.
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import uuid
+import threading
+from urllib.parse import parse_qsl, urlencode
+from collections import deque, Counter
+from datetime import datetime
+
+PERFILADOR_HABILITADO = os.getenv("PERFILADOR_HABILITADO", "0").lower() in ("1", "true", "si", "sí")
+PERFILADOR_TOKEN = os.getenv("PERFILADOR_TOKEN", "")
+PERFILADOR_UMBRAL_MS = float(os.getenv("PERFILADOR_UMBRAL_MS", "0"))
+PERFILADOR_INTERVALO_MS = float(os.getenv("PERFILADOR_INTERVALO_MS", "5"))
+PERFILADOR_MAX_PERFILES = int(os.getenv("PERFILADOR_MAX_PERFILES", "20"))
+
+PREFIJO_RUTAS = "/api/"
+MAX_BYTES_ENTRADA = 64 * 1024
+# ~100 s de historia a 5 ms por muestra; suficiente para cualquier petición razonable
+MAX_MUESTRAS = 20000
+
+
+class Muestreador:
+    def __init__(self, intervalo_ms):
+        self.intervalo = intervalo_ms / 1000.0
+        self.muestras = deque(maxlen=MAX_MUESTRAS)  # (instante, id_hilo, pila)
+        self._objetivos = Counter()
+        self._candado = threading.Lock()
+        self._hay_objetivos = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ciclo, name="perfilador", daemon=True)
+            self._hilo.start()
+
+    def registrar(self, id_hilo):
+        with self._candado:
+            self._objetivos[id_hilo] += 1
+            self._hay_objetivos.set()
+
+    def liberar(self, id_hilo):
+        with self._candado:
+            self._objetivos[id_hilo] -= 1
+            if self._objetivos[id_hilo] <= 0:
+                del self._objetivos[id_hilo]
+            if not self._objetivos:
+                self._hay_objetivos.clear()
+
+    def _ciclo(self):
+        while True:
+            self._hay_objetivos.wait()
+            with self._candado:
+                objetivos = list(self._objetivos)
+            marcos = sys._current_frames()
+            ahora = time.perf_counter()
+            for id_hilo in objetivos:
+                marco = marcos.get(id_hilo)
+                if marco is not None:
+                    self.muestras.append((ahora, id_hilo, _pila(marco)))
+            time.sleep(self.intervalo)
+
+    def colapsar(self, id_hilo, inicio, fin):
+        """Muestras del hilo en [inicio, fin] en formato collapsed: {'a;b;c': n}."""
+        conteo = Counter()
+        for instante, hilo, pila in list(self.muestras):
+            if hilo == id_hilo and inicio <= instante <= fin:
+                conteo[pila] += 1
+        return conteo
+
+
+def _pila(marco):
+    nombres = []
+    while marco is not None:
+        codigo = marco.f_code
+        modulo = marco.f_globals.get("__name__", "?")
+        nombres.append(f"{modulo}:{getattr(codigo, 'co_qualname', codigo.co_name)}")
+        marco = marco.f_back
+    return ";".join(reversed(nombres))
+
+
+def redactar_entrada(cuerpo: bytes, query: str):
+    """
+    Quita datos del cliente pero conserva lo necesario para reproducir el cálculo:
+    el nombre del proyecto se oculta y las coordenadas se redondean a 0.1°.
+    """
+    parametros = []
+    for clave, valor in parse_qsl(query):
+        if clave in ("lat", "lon"):
+            try:
+                valor = str(round(float(valor), 1))
+            except ValueError:
+                valor = "<redactado>"
+        parametros.append((clave, valor))
+    entrada = {"query": urlencode(parametros)}
+    if not cuerpo:
+        return entrada
+    try:
+        datos = json.loads(cuerpo)
+    except ValueError:
+        entrada["cuerpo"] = f"<{len(cuerpo)} bytes no JSON>"
+        return entrada
+
+    if isinstance(datos, dict):
+        if "nombre_proyecto" in datos:
+            datos["nombre_proyecto"] = "<redactado>"
+        if isinstance(datos.get("coordenadas"), str):
+            try:
+                lat, lon = (round(float(v), 1) for v in datos["coordenadas"].split(","))
+                datos["coordenadas"] = f"{lat}, {lon}"
+            except ValueError:
+                datos["coordenadas"] = "<redactado>"
+    entrada["cuerpo"] = datos
+    return entrada
+
+
+class Perfilador:
+    def __init__(self):
+        self.muestreador = Muestreador(PERFILADOR_INTERVALO_MS)
+        self.perfiles = deque(maxlen=PERFILADOR_MAX_PERFILES)
+
+    def guardar(self, perfil):
+        self.perfiles.append(perfil)
+
+    def listar(self):
+        return [
+            {k: v for k, v in p.items() if k not in ("colapsado", "entrada")}
+            for p in reversed(self.perfiles)
+        ]
+
+    def obtener(self, id_perfil):
+        return next((p for p in self.perfiles if p["id"] == id_perfil), None)
+
+
+perfilador = Perfilador()
+
+
+def token_valido(valor):
+    # Comparación en tiempo constante para no filtrar el token por latencia
+    return bool(PERFILADOR_TOKEN) and hmac.compare_digest(valor.encode(), PERFILADOR_TOKEN.encode())
+
+
+class MiddlewarePerfilador:
+    """Middleware ASGI: decide qué peticiones perfilar y guarda el resultado."""
+
+    def __init__(self, app):
+        self.app = app
+        perfilador.muestreador.iniciar()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(PREFIJO_RUTAS):
+            return await self.app(scope, receive, send)
+
+        encabezados = dict(scope["headers"])
+        forzado = token_valido(encabezados.get(b"x-perfilar", b"").decode())
+        if not forzado and PERFILADOR_UMBRAL_MS <= 0:
+            return await self.app(scope, receive, send)
+
+        id_perfil = uuid.uuid4().hex[:12]
+        cuerpo = bytearray()
+
+        async def receive_capturando():
+            mensaje = await receive()
+            if mensaje["type"] == "http.request" and len(cuerpo) < MAX_BYTES_ENTRADA:
+                cuerpo.extend(mensaje.get("body", b"")[:MAX_BYTES_ENTRADA - len(cuerpo)])
+            return mensaje
+
+        async def send_con_id(mensaje):
+            if forzado and mensaje["type"] == "http.response.start":
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [(b"x-perfil-id", id_perfil.encode())]
+            await send(mensaje)
+
+        id_hilo = threading.get_ident()
+        muestreador = perfilador.muestreador
+        muestreador.registrar(id_hilo)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive_capturando, send_con_id)
+        finally:
+            fin = time.perf_counter()
+            muestreador.liberar(id_hilo)
+
+            duracion_ms = (fin - inicio) * 1000.0
+            if forzado or duracion_ms >= PERFILADOR_UMBRAL_MS:
+                colapsado = muestreador.colapsar(id_hilo, inicio, fin)
+                perfilador.guardar({
+                    "id": id_perfil,
+                    "fecha": datetime.now().isoformat(),
+                    "metodo": scope["method"],
+                    "ruta": scope["path"],
+                    "duracion_ms": round(duracion_ms, 2),
+                    "disparador": "encabezado" if forzado else "umbral",
+                    "muestras": sum(colapsado.values()),
+                    "entrada": redactar_entrada(bytes(cuerpo), scope.get("query_string", b"").decode()),
+                    "colapsado": "\n".join(f"{pila} {n}" for pila, n in colapsado.most_common()),
+                })
@@ -0,0 +1,98 @@
+# app/services/catalog_service.py
+import os
+import hmac
+import base64
+import hashlib
+import secrets
+import json
+import numpy as np
+from app.database import db
+
+LIMITE_MAXIMO = 100
+
+# Llave de los cursores. Si no se define, se genera por proceso: los cursores
+# no sobreviven un reinicio ni se comparten entre workers.
+CURSOR_SECRETO = os.getenv("CURSOR_SECRETO") or secrets.token_hex(32)
+
+
+def _firmar_cursor(version, firma, offset):
+    # La llave incluye la versión del catálogo: un cambio de catálogo invalida los cursores
+    llave = f"{CURSOR_SECRETO}:{version}".encode()
+    mensaje = json.dumps([firma, offset]).encode()
+    return hmac.new(llave, mensaje, hashlib.sha256).hexdigest()[:32]
+
+
+def _codificar_cursor(version, firma, offset):
+    crudo = json.dumps({"v": version, "f": firma, "o": offset, "s": _firmar_cursor(version, firma, offset)}).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor, version, firma):
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        offset = int(datos["o"])
+        sello = str(datos["s"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
+    # Un cursor solo es válido para la misma consulta y la misma versión de catálogo
+    if datos.get("v") != version or datos.get("f") != firma:
+        raise ValueError("El cursor no corresponde a esta consulta o el catálogo cambió; reinicie la paginación")
+    if offset < 0 or not hmac.compare_digest(sello.encode(), _firmar_cursor(version, firma, offset).encode()):
+        raise ValueError("Cursor inválido")
+    return offset
+
+
+def buscar_catalogo(tabla, filtros, orden=None, descendente=False, limite=20, cursor=None):
+    """
+    Busca en el catálogo usando los índices ordenados por columna.
+
+    filtros: {columna: (minimo, maximo)}; cualquiera de los dos puede ser None.
+    Cada rango se resuelve con búsqueda binaria sobre el índice de su columna.
+    """
+    if not db.indices_listos:
+        db.construir_indices()
+
+    indices = db.indices_columnas[tabla]
+    registros = db.registros_catalogo[tabla]
+
+    for columna in list(filtros) + ([orden] if orden else []):
+        if columna not in indices:
+            raise ValueError(f"Columna no indexada en {tabla}: {columna}")
+
+    # 1. Filtros por rango -> máscara de posiciones que cumplen todos
+    seleccion = np.ones(len(registros), dtype=bool)
+    for columna, (minimo, maximo) in filtros.items():
+        if minimo is None and maximo is None:
+            continue
+        valores, posiciones = indices[columna]
+        inicio = 0 if minimo is None else np.searchsorted(valores, minimo, side='left')
+        fin = len(valores) if maximo is None else np.searchsorted(valores, maximo, side='right')
+        en_rango = np.zeros(len(registros), dtype=bool)
+        en_rango[posiciones[inicio:fin]] = True
+        seleccion &= en_rango
+
+    # 2. Orden: recorremos el índice de la columna de orden (ya ordenado)
+    if orden:
+        posiciones_orden = indices[orden][1]
+        resultado = posiciones_orden[seleccion[posiciones_orden]]
+        if descendente:
+            resultado = resultado[::-1]
+    else:
+        resultado = np.flatnonzero(seleccion)
+
+    # 3. Paginación por cursor
+    consulta = json.dumps([tabla, sorted(filtros.items()), orden, descendente, limite])
+    firma = hashlib.sha256(consulta.encode()).hexdigest()[:12]
+    offset = _decodificar_cursor(cursor, db.version_catalogo, firma) if cursor else 0
+    pagina = resultado[offset:offset + limite]
+    siguiente = offset + limite
+
+    return {
+        "version_catalogo": db.version_catalogo,
+        "total": int(len(resultado)),
+        "items": [registros[i] for i in pagina],
+        "siguiente_cursor": (
+            _codificar_cursor(db.version_catalogo, firma, siguiente) if siguiente < len(resultado) else None
+        ),
+    }
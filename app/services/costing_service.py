@@ -49,6 +49,28 @@ def buscar_costo_indirecto(concepto):
         return float(db.precios_indirectos.loc[concepto]['Costo'])
     return 0.0
 
+def obtener_margenes():
+    # Valores default si no carga el CSV
+    margenes = {
+        "contingencia": 0.05,
+        "utilidad": 0.20,
+        "comision": 0.03,
+        "ingenieria": 15000.00, # Fijo ejemplo
+    }
+    
+    # Intento de cargar de DB si existe
+    try:
+        margenes["contingencia"] = float(db.config_global.loc['Contingencia_Porcentaje']['Valor'])
+        margenes["utilidad"] = float(db.config_global.loc['Margen_Utilidad_Porcentaje']['Valor'])
+    except:
+        pass
+    return margenes
+
+def factor_margenes():
+    """Cuánto crece el CAPEX por cada peso de costo directo (contingencia, comisión y utilidad)."""
+    m = obtener_margenes()
+    return (1 + m["contingencia"]) * (1 + m["comision"]) * (1 + m["utilidad"])
+
 def generar_reporte_costos(proyecto_input, res_dc, res_ac, decision_interconexion):
     BOM = []
     
@@ -125,26 +147,16 @@ def generar_reporte_costos(proyecto_input, res_dc, res_ac, decision_interconexio
     costo_directo = costo_materiales + costo_mo
 
     # 3. Indirectos y Márgenes (Desde configuracion_global o constantes)
-    # Valores default si no carga el CSV
-    porc_contingencia = 0.05 
-    porc_utilidad = 0.20
-    costo_ingenieria = 15000.00 # Fijo ejemplo
-    
-    # Intento de cargar de DB si existe
-    try:
-        porc_contingencia = float(db.config_global.loc['Contingencia_Porcentaje']['Valor'])
-        porc_utilidad = float(db.config_global.loc['Margen_Utilidad_Porcentaje']['Valor'])
-    except:
-        pass
+    margenes = obtener_margenes()
 
-    contingencia = costo_directo * porc_contingencia
-    subtotal_1 = costo_directo + costo_ingenieria + contingencia
+    contingencia = costo_directo * margenes["contingencia"]
+    subtotal_1 = costo_directo + margenes["ingenieria"] + contingencia
     
     # Comision (ej. 3% del subtotal)
-    comision = subtotal_1 * 0.03 
+    comision = subtotal_1 * margenes["comision"]
     subtotal_2 = subtotal_1 + comision
     
-    utilidad = subtotal_2 * porc_utilidad
+    utilidad = subtotal_2 * margenes["utilidad"]
     capex_final = subtotal_2 + utilidad
 
     return {
@@ -0,0 +1,148 @@
+# app/services/cotizacion_en_vivo_service.py
+import os
+import json
+import asyncio
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from app.models import ProyectoInput
+from app.services.cotizacion_service import parsear_coordenadas, resolver_clima, calcular_cotizacion
+
+# Ventana de silencio antes de recalcular; mientras lleguen cambios se sigue esperando...
+DEBOUNCE_MS = float(os.getenv("COTIZACION_VIVO_DEBOUNCE_MS", "150"))
+# ...pero nunca más de esto, para que arrastrar un slider siga mostrando resultados
+ESPERA_MAXIMA_MS = float(os.getenv("COTIZACION_VIVO_ESPERA_MAXIMA_MS", "1000"))
+
+# Campos de la entrada que determinan el clima; si no cambian, se reutiliza el de la sesión
+CAMPOS_CLIMA = ("coordenadas", "calibracion_climatica", "temperaturas_percentil")
+
+
+def fusionar(base, cambios):
+    """JSON Merge Patch (RFC 7386): dicts se mezclan, None borra, listas se reemplazan."""
+    if not isinstance(cambios, dict):
+        return cambios
+    resultado = dict(base) if isinstance(base, dict) else {}
+    for clave, valor in cambios.items():
+        if valor is None:
+            resultado.pop(clave, None)
+        else:
+            resultado[clave] = fusionar(resultado.get(clave), valor)
+    return resultado
+
+
+class SesionCotizacion:
+    """
+    Estado de una sesión de cotización en vivo: la última entrada válida,
+    el clima ya resuelto y la versión de la edición más reciente.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.entrada = None
+        self.incluir_bom = False
+        self.version = 0
+        self._clave_clima = None
+        self._clima = None  # (DatosClimaticos, alertas de clima)
+        self._cambio = asyncio.Event()
+
+    async def enviar_error(self, detalle, version=None):
+        await self.websocket.send_json({"tipo": "error", "version": version, "detalle": detalle})
+
+    async def recibir(self):
+        """Aplica cada mensaje al estado; el cálculo lo hace calcular_en_ciclo."""
+        while True:
+            try:
+                mensaje = json.loads(await self.websocket.receive_text())
+                tipo = mensaje["tipo"]
+            except (ValueError, KeyError, TypeError):
+                await self.enviar_error("Mensaje inválido: se espera JSON con 'tipo' ('inicio' o 'delta')")
+                continue
+
+            if tipo == "inicio":
+                nueva = mensaje.get("proyecto")
+                self.incluir_bom = bool(mensaje.get("incluir_bom", False))
+            elif tipo == "delta" and self.entrada is not None:
+                nueva = fusionar(self.entrada, mensaje.get("cambios") or {})
+            elif tipo == "delta":
+                await self.enviar_error("Envíe primero un mensaje 'inicio' con el proyecto completo")
+                continue
+            else:
+                await self.enviar_error(f"Tipo de mensaje desconocido: {tipo}")
+                continue
+
+            try:
+                ProyectoInput.model_validate(nueva)
+            except ValidationError as e:
+                # El delta se descarta; la sesión conserva el último estado válido
+                await self.enviar_error(json.loads(e.json()), self.version)
+                continue
+
+            self.entrada = nueva
+            self.version += 1
+            self._cambio.set()
+
+    async def _esperar_calma(self):
+        # Debounce: reinicia la ventana con cada cambio, con tope de ESPERA_MAXIMA_MS
+        limite = asyncio.get_running_loop().time() + ESPERA_MAXIMA_MS / 1000.0
+        while True:
+            self._cambio.clear()
+            restante = limite - asyncio.get_running_loop().time()
+            if restante <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._cambio.wait(), timeout=min(DEBOUNCE_MS / 1000.0, restante))
+            except asyncio.TimeoutError:
+                return
+
+    async def calcular_en_ciclo(self):
+        while True:
+            await self._cambio.wait()
+            await self._esperar_calma()
+
+            version, entrada = self.version, self.entrada
+            try:
+                respuesta = await self._calcular(entrada, version)
+            except ValueError as e:
+                respuesta = {"tipo": "error", "version": version, "detalle": str(e)}
+            except HTTPException as e:
+                respuesta = {"tipo": "error", "version": version, "detalle": e.detail}
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                respuesta = {"tipo": "error", "version": version, "detalle": f"Error interno: {str(e)}"}
+
+            # Si llegó una edición durante el cálculo, este resultado ya es viejo
+            if version == self.version:
+                await self.websocket.send_json(respuesta)
+
+    async def _calcular(self, entrada, version):
+        proyecto = ProyectoInput.model_validate(entrada)
+
+        clave_clima = json.dumps([entrada.get(c) for c in CAMPOS_CLIMA], sort_keys=True)
+        if clave_clima != self._clave_clima:
+            lat, lon = parsear_coordenadas(proyecto.coordenadas)
+            alertas_clima = []
+            datos_climaticos = await resolver_clima(proyecto, lat, lon, alertas_clima)
+            self._clave_clima, self._clima = clave_clima, (datos_climaticos, alertas_clima)
+
+        datos_climaticos, alertas_clima = self._clima
+        alertas = list(alertas_clima)
+        resultado = calcular_cotizacion(proyecto, datos_climaticos, alertas)
+
+        respuesta = {
+            "tipo": "resultado",
+            "version": version,
+            "resumen_costos": resultado["Costos"].model_dump(),
+            "alertas_ingenieria": alertas,
+        }
+        if self.incluir_bom:
+            respuesta["BOM_detallada"] = [item.model_dump() for item in resultado["BOM"]]
+        return respuesta
+
+    async def atender(self):
+        calculo = asyncio.create_task(self.calcular_en_ciclo())
+        try:
+            await self.recibir()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            calculo.cancel()
@@ -0,0 +1,84 @@
+# app/services/cotizacion_service.py
+from app.models import DatosClimaticos
+from app.services.dc_service import calcular_circuito_dc
+from app.services.ac_service import calcular_circuito_ac
+from app.services.costing_service import generar_reporte_costos
+from app.services.weather_service import obtener_datos_nasa
+from app.services.temperaturas_diseno_service import obtener_temperaturas_percentil
+
+
+def parsear_coordenadas(coordenadas):
+    try:
+        lat_str, lon_str = coordenadas.split(',')
+        return float(lat_str.strip()), float(lon_str.strip())
+    except ValueError:
+        raise ValueError("Formato de coordenadas inválido. Use 'lat, lon'")
+
+
+async def resolver_clima(proyecto, lat, lon, alertas) -> DatosClimaticos:
+    """Lógica Híbrida: Calibración manual vs NASA (climatología o percentiles)."""
+    datos_climaticos = None
+
+    usar_manual = False
+    if proyecto.calibracion_climatica and proyecto.calibracion_climatica.usar_override:
+        usar_manual = True
+        manual = proyecto.calibracion_climatica.datos_manuales
+
+        # Verificamos que vengan los datos críticos
+        if manual.temp_min_media_mensual is not None and manual.temp_max_media_mensual is not None:
+            alertas.append({
+                "codigo": "CLIMA-MANUAL",
+                "mensaje": f"Usando datos manuales de: {proyecto.calibracion_climatica.fuente_datos}"
+            })
+
+            # Mapeo de variables Conagua -> Variables de Diseño del Sistema
+            datos_climaticos = DatosClimaticos(
+                # Para Voc usamos la mínima media reportada (4.3°C según tu ejemplo)
+                # Nota: Podrías aplicar un margen de seguridad aquí si quisieras (ej. -2°C)
+                temperatura_minima_historica=manual.temp_min_media_mensual,
+
+                # Para Ampacidad usamos la máxima media reportada (27.8°C)
+                temperatura_maxima_promedio=manual.temp_max_media_mensual,
+
+                temperatura_promedio_anual=manual.temp_promedio_anual,
+                ubicacion_validada=f"Manual Override ({lat}, {lon})"
+            )
+        else:
+            alertas.append({
+                "codigo": "WARN-MANUAL-INCOMPLETO",
+                "mensaje": "Se activó override pero faltan datos. Usando NASA como respaldo."
+            })
+            usar_manual = False
+
+    # Si no se usó manual (o faltaban datos), vamos a la NASA
+    if not usar_manual and proyecto.temperaturas_percentil:
+        pct = proyecto.temperaturas_percentil
+        datos_climaticos = await obtener_temperaturas_percentil(
+            lat, lon, pct.percentil_min, pct.percentil_max, pct.anio_inicio, pct.anio_fin
+        )
+        alertas.append({
+            "codigo": "INFO-CLIMA-PERCENTIL",
+            "mensaje": f"Datos NASA diarios P{pct.percentil_min}/P{pct.percentil_max}: Tmin={datos_climaticos.temperatura_minima_historica}, Tmax={datos_climaticos.temperatura_maxima_promedio}"
+        })
+    elif not usar_manual:
+        datos_climaticos = await obtener_datos_nasa(lat, lon)
+        alertas.append({
+            "codigo": "INFO-CLIMA-NASA",
+            "mensaje": f"Datos NASA: Tmin={datos_climaticos.temperatura_minima_historica}, Tmax={datos_climaticos.temperatura_maxima_promedio}"
+        })
+
+    return datos_climaticos
+
+
+def calcular_cotizacion(proyecto, datos_climaticos, alertas):
+    """Dimensionamiento DC, AC y costeo. No hace I/O: el clima ya viene resuelto."""
+    # 3. Cálculo DC
+    res_dc = calcular_circuito_dc(proyecto, datos_climaticos, alertas)
+
+    # 4. Cálculo AC
+    res_ac = calcular_circuito_ac(proyecto, res_dc, datos_climaticos, alertas)
+
+    # 5. Costeo
+    return generar_reporte_costos(
+        proyecto, res_dc, res_ac, proyecto.decision_interconexion
+    )
@@ -0,0 +1,140 @@
+# app/services/portfolio_service.py
+import json
+from app.database import db
+from app.models import ItemConsolidado, ResumenPortafolio, PortafolioOutput
+from app.services.costing_service import buscar_precio, factor_margenes
+
+
+class AcumuladorPortafolio:
+    """
+    Reduce BOMs de muchos proyectos por SKU (item, especificación, unidad)
+    en una sola pasada. Solo guarda los totales por partida, nunca las cotizaciones.
+    """
+
+    def __init__(self):
+        self.partidas = {}  # {(item, especificacion, unidad): [cantidad, num_proyectos]}
+        self.proyectos = 0
+        self.capex_proyectos = 0.0
+
+    def agregar_linea(self, linea: bytes, numero_linea: int):
+        linea = linea.strip()
+        if not linea:
+            return
+        try:
+            cotizacion = json.loads(linea)
+            bom = cotizacion["BOM_detallada"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"Línea {numero_linea}: se esperaba un JSON con 'BOM_detallada'")
+        if not isinstance(bom, list):
+            raise ValueError(f"Línea {numero_linea}: 'BOM_detallada' debe ser una lista")
+
+        # Se valida el resumen antes de acumular para no dejar la línea a medias
+        resumen = cotizacion.get("resumen_costos") or {}
+        if not isinstance(resumen, dict):
+            raise ValueError(f"Línea {numero_linea}: 'resumen_costos' debe ser un objeto")
+        try:
+            capex = float(resumen.get("CAPEX_Final", 0.0))
+        except (TypeError, ValueError):
+            raise ValueError(f"Línea {numero_linea}: 'CAPEX_Final' no es numérico")
+
+        partidas_linea = []
+        for partida in bom:
+            try:
+                clave = (partida["item"], partida["especificacion"], partida["unidad"])
+                cantidad = float(partida["cantidad"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Línea {numero_linea}: partida de BOM incompleta: {partida}")
+            if not all(isinstance(campo, str) for campo in clave):
+                raise ValueError(f"Línea {numero_linea}: item, especificacion y unidad deben ser texto: {partida}")
+            partidas_linea.append((clave, cantidad))
+
+        vistos = set()
+        for clave, cantidad in partidas_linea:
+            acumulado = self.partidas.get(clave)
+            if acumulado is None:
+                acumulado = self.partidas[clave] = [0.0, 0]
+            acumulado[0] += cantidad
+            if clave not in vistos:
+                acumulado[1] += 1
+                vistos.add(clave)
+
+        self.proyectos += 1
+        self.capex_proyectos += capex
+
+    def resultado(self) -> PortafolioOutput:
+        if not db.indices_listos:
+            db.construir_indices()
+
+        # Mismo criterio de precio que generar_reporte_costos: el SKU es la especificación.
+        # Un SKU puede aparecer en varias partidas (ej. "10 AWG" como cable PV y como
+        # tierra), así que el tramo se decide con el total comprado de ese SKU.
+        total_por_sku = {}
+        for (_, especificacion, _), (cantidad, _) in self.partidas.items():
+            total_por_sku[especificacion] = total_por_sku.get(especificacion, 0.0) + cantidad
+
+        consolidada = []
+        costo_lista = costo_volumen = 0.0
+        for (item, especificacion, unidad), (cantidad, proyectos) in self.partidas.items():
+            precio_lista = buscar_precio(especificacion, item)
+            precio, tramo = precio_por_volumen(especificacion, total_por_sku[especificacion], precio_lista)
+
+            costo_lista += cantidad * precio_lista
+            costo_volumen += cantidad * precio
+            consolidada.append(ItemConsolidado(
+                item=item,
+                especificacion=especificacion,
+                unidad=unidad,
+                cantidad=round(cantidad, 2),
+                proyectos=proyectos,
+                precio_lista=precio_lista,
+                precio_unitario=precio,
+                tramo_volumen=tramo,
+                costo_total=round(cantidad * precio, 2),
+                ahorro_volumen=round(cantidad * (precio_lista - precio), 2),
+            ))
+
+        ahorro = costo_lista - costo_volumen
+        return PortafolioOutput(
+            resumen=ResumenPortafolio(
+                proyectos=self.proyectos,
+                partidas=len(consolidada),
+                Costo_Materiales_Lista=round(costo_lista, 2),
+                Costo_Materiales_Volumen=round(costo_volumen, 2),
+                Ahorro_Volumen=round(ahorro, 2),
+                CAPEX_Proyectos=round(self.capex_proyectos, 2),
+                # El ahorro en materiales también reduce contingencia, comisión y utilidad
+                CAPEX_Portafolio=round(self.capex_proyectos - ahorro * factor_margenes(), 2),
+            ),
+            BOM_consolidada=sorted(consolidada, key=lambda p: (p.item, p.especificacion)),
+        )
+
+
+def precio_por_volumen(sku, cantidad, precio_lista):
+    """
+    Precio del tramo más alto alcanzado por la cantidad consolidada del SKU.
+    Devuelve (precio, cantidad_minima_del_tramo) o (precio_lista, None).
+    """
+    precio, tramo = precio_lista, None
+    for cantidad_minima, costo in db.tramos_volumen.get(sku, []):
+        if cantidad >= cantidad_minima:
+            precio, tramo = costo, cantidad_minima
+    return precio, tramo
+
+
+async def consolidar_ndjson(flujo) -> PortafolioOutput:
+    """
+    Consume un flujo NDJSON (una salida de costear-proyecto por línea)
+    conforme llega, sin cargar el cuerpo completo en memoria.
+    """
+    acumulador = AcumuladorPortafolio()
+    pendiente = b""
+    numero_linea = 0
+    async for bloque in flujo:
+        pendiente += bloque
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            numero_linea += 1
+            acumulador.agregar_linea(linea, numero_linea)
+    if pendiente.strip():
+        acumulador.agregar_linea(pendiente, numero_linea + 1)
+    return acumulador.resultado()
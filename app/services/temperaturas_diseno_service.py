@@ -0,0 +1,213 @@
+# app/services/temperaturas_diseno_service.py
+import os
+import asyncio
+from datetime import date
+import numpy as np
+import pandas as pd
+import httpx
+from fastapi import HTTPException
+from app.models import DatosClimaticos
+from app.services.weather_service import (
+    NASA_POWER_BASE_URL,
+    celda_nasa,
+    registrar_exito_upstream,
+    registrar_error_upstream,
+)
+
+NASA_DAILY_URL = f"{NASA_POWER_BASE_URL}/api/temporal/daily/point"
+
+# Series diarias locales opcionales: {CLIMA_DIARIO_DIR}/{celda}.csv con columnas
+# fecha (YYYY-MM-DD o YYYYMMDD), T2M_MIN y T2M_MAX
+CLIMA_DIARIO_DIR = os.getenv("CLIMA_DIARIO_DIR")
+# Percentiles ya reducidos por celda (npz comprimido)
+CACHE_PERCENTILES_DIR = os.getenv(
+    "CACHE_PERCENTILES_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cache_percentiles')
+)
+
+# Niveles que se guardan por celda: P0.1 a P99.9 cada 0.1 (999 valores por serie).
+# Los percentiles aceptados se limitan a este rango; entre niveles se interpola.
+PERCENTIL_MINIMO = 0.1
+PERCENTIL_MAXIMO = 99.9
+NIVELES_PERCENTIL = np.round(np.arange(1, 1000) * 0.1, 1)
+# Cambia si cambia NIVELES_PERCENTIL, para no leer cachés con otros niveles
+FORMATO_CACHE = 2
+
+VALOR_FALTANTE_NASA = -999.0
+# Serie diaria de NASA POWER: desde 1981 hasta el último año completo
+ANIO_MINIMO_NASA = 1981
+
+
+def ultimo_anio_completo() -> int:
+    return date.today().year - 1
+
+_cache_memoria = {}
+# Un candado por (celda, años): peticiones simultáneas a una celda nueva
+# esperan a la primera en vez de descargar la serie cada una
+_candados = {}
+
+
+def reducir_percentiles(t_min: np.ndarray, t_max: np.ndarray) -> dict:
+    """
+    Reduce décadas de datos diarios a los percentiles de NIVELES_PERCENTIL.
+    Descarta valores de relleno de NASA (-999) y NaN.
+    """
+    t_min = np.asarray(t_min, dtype=float)
+    t_max = np.asarray(t_max, dtype=float)
+    t_min = t_min[np.isfinite(t_min) & (t_min > VALOR_FALTANTE_NASA + 1)]
+    t_max = t_max[np.isfinite(t_max) & (t_max > VALOR_FALTANTE_NASA + 1)]
+
+    if t_min.size == 0 or t_max.size == 0:
+        raise ValueError("La serie diaria no contiene temperaturas válidas")
+
+    return {
+        "niveles": NIVELES_PERCENTIL,
+        "t_min": np.percentile(t_min, NIVELES_PERCENTIL),
+        "t_max": np.percentile(t_max, NIVELES_PERCENTIL),
+        "dias": np.array([t_min.size, t_max.size]),
+    }
+
+
+def tamano_cache_percentiles() -> int:
+    return len(_cache_memoria)
+
+
+def _ruta_cache(celda: str, anio_inicio: int, anio_fin: int) -> str:
+    return os.path.join(CACHE_PERCENTILES_DIR, f"{celda}_{anio_inicio}_{anio_fin}_v{FORMATO_CACHE}.npz")
+
+
+def _leer_cache(celda, anio_inicio, anio_fin):
+    clave = (celda, anio_inicio, anio_fin)
+    if clave in _cache_memoria:
+        return _cache_memoria[clave]
+
+    ruta = _ruta_cache(celda, anio_inicio, anio_fin)
+    if not os.path.exists(ruta):
+        return None
+    with np.load(ruta) as datos:
+        reducido = {k: datos[k] for k in datos.files}
+    _cache_memoria[clave] = reducido
+    return reducido
+
+
+def _guardar_cache(celda, anio_inicio, anio_fin, reducido):
+    _cache_memoria[(celda, anio_inicio, anio_fin)] = reducido
+    try:
+        os.makedirs(CACHE_PERCENTILES_DIR, exist_ok=True)
+        np.savez_compressed(_ruta_cache(celda, anio_inicio, anio_fin), **reducido)
+    except OSError as e:
+        # El caché en disco es una optimización; si falla seguimos con el de memoria
+        print(f"⚠️ No se pudo escribir el caché de percentiles ({celda}): {e}")
+
+
+def _serie_local(celda, anio_inicio, anio_fin):
+    if not CLIMA_DIARIO_DIR:
+        return None
+    ruta = os.path.join(CLIMA_DIARIO_DIR, f"{celda}.csv")
+    if not os.path.exists(ruta):
+        return None
+    try:
+        serie = pd.read_csv(ruta, usecols=['fecha', 'T2M_MIN', 'T2M_MAX'], dtype={'fecha': str})
+    except ValueError:
+        raise ValueError(f"{ruta} debe tener las columnas fecha, T2M_MIN y T2M_MAX")
+    # Solo los años pedidos, igual que la consulta a NASA
+    anios = pd.to_datetime(serie['fecha'], format='mixed').dt.year
+    serie = serie[(anios >= anio_inicio) & (anios <= anio_fin)]
+    return serie['T2M_MIN'].to_numpy(dtype=float), serie['T2M_MAX'].to_numpy(dtype=float)
+
+
+async def _serie_nasa(lat, lon, anio_inicio, anio_fin):
+    params = {
+        "parameters": "T2M_MAX,T2M_MIN",
+        "community": "RE",
+        "longitude": lon,
+        "latitude": lat,
+        "start": f"{anio_inicio}0101",
+        "end": f"{anio_fin}1231",
+        "format": "JSON"
+    }
+
+    async with httpx.AsyncClient() as client:
+        try:
+            response = await client.get(NASA_DAILY_URL, params=params, timeout=60.0)
+            response.raise_for_status()
+            data = response.json()
+        except httpx.RequestError as e:
+            registrar_error_upstream(e)
+            raise HTTPException(status_code=503, detail=f"Error conectando con NASA: {e}")
+        except httpx.HTTPStatusError as e:
+            registrar_error_upstream(e)
+            raise HTTPException(status_code=response.status_code, detail="NASA API Error")
+    registrar_exito_upstream()
+
+    try:
+        properties = data['properties']['parameter']
+        # Los dicts vienen como {"YYYYMMDD": valor}; np.fromiter evita listas intermedias
+        t_min = np.fromiter(properties['T2M_MIN'].values(), dtype=float)
+        t_max = np.fromiter(properties['T2M_MAX'].values(), dtype=float)
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=500, detail="Estructura de datos NASA inesperada")
+    return t_min, t_max
+
+
+async def obtener_percentiles_celda(lat: float, lon: float, anio_inicio: int, anio_fin: int) -> dict:
+    """
+    Percentiles reducidos de la celda NASA que contiene (lat, lon).
+    La serie diaria se descarga (o se lee de CLIMA_DIARIO_DIR) una sola vez por celda.
+    """
+    celda = celda_nasa(lat, lon)
+    reducido = _leer_cache(celda, anio_inicio, anio_fin)
+    if reducido is not None:
+        return reducido
+
+    candado = _candados.setdefault((celda, anio_inicio, anio_fin), asyncio.Lock())
+    async with candado:
+        # Otra petición pudo haberla calculado mientras esperábamos
+        reducido = _leer_cache(celda, anio_inicio, anio_fin)
+        if reducido is not None:
+            return reducido
+
+        serie = _serie_local(celda, anio_inicio, anio_fin)
+        if serie is None:
+            serie = await _serie_nasa(lat, lon, anio_inicio, anio_fin)
+
+        reducido = reducir_percentiles(*serie)
+        _guardar_cache(celda, anio_inicio, anio_fin, reducido)
+    # Ya en caché: las peticiones nuevas no llegan al candado
+    _candados.pop((celda, anio_inicio, anio_fin), None)
+    return reducido
+
+
+async def obtener_temperaturas_percentil(
+    lat: float,
+    lon: float,
+    percentil_min: float = 0.4,
+    percentil_max: float = 99.6,
+    anio_inicio: int = 1991,
+    anio_fin: int = 2020,
+) -> DatosClimaticos:
+    """
+    Temperaturas de diseño estilo ASHRAE: percentil bajo de las mínimas diarias
+    (para Voc) y percentil alto de las máximas diarias (para ampacidad).
+    """
+    if not (PERCENTIL_MINIMO <= percentil_min <= PERCENTIL_MAXIMO and
+            PERCENTIL_MINIMO <= percentil_max <= PERCENTIL_MAXIMO):
+        raise ValueError(f"Los percentiles deben estar entre {PERCENTIL_MINIMO} y {PERCENTIL_MAXIMO}")
+    if anio_inicio > anio_fin:
+        raise ValueError("anio_inicio debe ser menor o igual a anio_fin")
+    # Se rechaza antes de descargar: cada ventana nueva es otra serie y otro caché
+    if anio_inicio < ANIO_MINIMO_NASA or anio_fin > ultimo_anio_completo():
+        raise ValueError(f"Los años deben estar entre {ANIO_MINIMO_NASA} y {ultimo_anio_completo()}")
+
+    reducido = await obtener_percentiles_celda(lat, lon, anio_inicio, anio_fin)
+
+    temp_min_diseno = float(np.interp(percentil_min, reducido["niveles"], reducido["t_min"]))
+    temp_max_diseno = float(np.interp(percentil_max, reducido["niveles"], reducido["t_max"]))
+
+    return DatosClimaticos(
+        temperatura_minima_historica=round(temp_min_diseno, 2),
+        temperatura_maxima_promedio=round(temp_max_diseno, 2),
+        ubicacion_validada=(
+            f"Lat: {lat}, Lon: {lon} (celda {celda_nasa(lat, lon)}, "
+            f"P{percentil_min}/P{percentil_max} {anio_inicio}-{anio_fin})"
+        )
+    )
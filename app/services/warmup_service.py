@@ -0,0 +1,115 @@
+# app/services/warmup_service.py
+import os
+import asyncio
+import traceback
+from datetime import datetime
+from app.database import db
+from app.services.weather_service import (
+    obtener_datos_nasa,
+    estado_upstream,
+    tamano_cache_climatologia,
+)
+from app.services.temperaturas_diseno_service import (
+    obtener_temperaturas_percentil,
+    tamano_cache_percentiles,
+)
+
+# Ubicaciones a pre-consultar al arrancar, formato "lat,lon;lat,lon"
+# ej. UBICACIONES_CALIENTES="19.43,-99.13;25.67,-100.31;20.67,-103.35"
+UBICACIONES_CALIENTES = os.getenv("UBICACIONES_CALIENTES", "")
+# También pre-calcular percentiles diarios (más pesado; desactivado por default)
+CALENTAR_PERCENTILES = os.getenv("CALENTAR_PERCENTILES", "0").lower() in ("1", "true", "si", "sí")
+CONCURRENCIA_CALENTAMIENTO = int(os.getenv("CONCURRENCIA_CALENTAMIENTO", "4"))
+
+estado_calentamiento = {
+    "listo": False,
+    "inicio": None,
+    "fin": None,
+    "ubicaciones_ok": 0,
+    "ubicaciones_error": [],
+    "error": None,
+}
+
+
+def parsear_ubicaciones(texto):
+    ubicaciones = []
+    for par in texto.split(";"):
+        if not par.strip():
+            continue
+        try:
+            lat_str, lon_str = par.split(",")
+            ubicaciones.append((float(lat_str.strip()), float(lon_str.strip())))
+        except ValueError:
+            print(f"⚠️ Ubicación caliente inválida ignorada: '{par}'")
+    return ubicaciones
+
+
+async def _precargar_ubicacion(lat, lon, semaforo):
+    async with semaforo:
+        try:
+            await obtener_datos_nasa(lat, lon)
+            if CALENTAR_PERCENTILES:
+                await obtener_temperaturas_percentil(lat, lon)
+            estado_calentamiento["ubicaciones_ok"] += 1
+        except Exception as e:
+            # Un fallo de NASA no debe impedir que el worker reciba tráfico
+            detalle = getattr(e, "detail", str(e))
+            estado_calentamiento["ubicaciones_error"].append(f"{lat},{lon}: {detalle}")
+
+
+async def calentar():
+    """
+    Fase de calentamiento: construye índices del catálogo y pre-consulta
+    el clima de las ubicaciones frecuentes. Al terminar, /health/ready responde 200.
+
+    Los fallos de NASA por ubicación no bloquean (se registran y el worker queda
+    listo). Cualquier otro fallo (ej. el catálogo no se puede indexar) deja el
+    worker NO listo a propósito: /health/ready sigue en 503 con el error, para
+    que el orquestador no le mande tráfico ni complete el despliegue.
+    """
+    estado_calentamiento["inicio"] = datetime.now().isoformat()
+
+    try:
+        db.construir_indices()
+
+        semaforo = asyncio.Semaphore(CONCURRENCIA_CALENTAMIENTO)
+        await asyncio.gather(*[
+            _precargar_ubicacion(lat, lon, semaforo)
+            for lat, lon in parsear_ubicaciones(UBICACIONES_CALIENTES)
+        ])
+    except Exception as e:
+        traceback.print_exc()
+        estado_calentamiento["error"] = f"{type(e).__name__}: {e}"
+        estado_calentamiento["fin"] = datetime.now().isoformat()
+        print(f"🔴 Calentamiento fallido, el worker no se marcará listo: {estado_calentamiento['error']}")
+        return
+
+    estado_calentamiento["fin"] = datetime.now().isoformat()
+    estado_calentamiento["listo"] = True
+    print(f"Calentamiento completado: {estado_calentamiento['ubicaciones_ok']} ubicaciones pre-cargadas.")
+
+
+def estatus_upstream():
+    if estado_upstream["errores_consecutivos"] > 0:
+        return "degradado"
+    if estado_upstream["ultimo_exito"] is None:
+        return "desconocido"
+    return "ok"
+
+
+def reporte_salud():
+    return {
+        "listo": estado_calentamiento["listo"],
+        "version_catalogo": db.version_catalogo,
+        "indices_catalogo": db.indices_listos,
+        "catalogo": {
+            "paneles": len(db.paneles),
+            "inversores": len(db.inversores),
+        },
+        "cache_clima": {
+            "climatologia": tamano_cache_climatologia(),
+            "percentiles": tamano_cache_percentiles(),
+        },
+        "upstream_nasa": {"estatus": estatus_upstream(), **estado_upstream},
+        "calentamiento": dict(estado_calentamiento),
+    }
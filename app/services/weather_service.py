@@ -1,14 +1,87 @@
 # app/services/weather_service.py
+import os
+import asyncio
+from datetime import datetime
 import httpx
 from fastapi import HTTPException
 from app.models import DatosClimaticos
 
-NASA_API_URL = "https://power.larc.nasa.gov/api/temporal/climatology/point"
+# La URL base se puede sobreescribir (ej. para apuntar al servidor falso de loadtest/)
+NASA_POWER_BASE_URL = os.getenv("NASA_POWER_BASE_URL", "https://power.larc.nasa.gov").rstrip("/")
+NASA_API_URL = f"{NASA_POWER_BASE_URL}/api/temporal/climatology/point"
+
+# Malla de NASA POWER (MERRA-2): 0.5° lat x 0.625° lon
+PASO_LAT = 0.5
+PASO_LON = 0.625
+
+# Climatología ya consultada por celda: {celda: (temp_min_diseno, temp_max_pico)}
+# Los promedios mensuales no cambian entre consultas, así que no expiran.
+_cache_climatologia = {}
+# Un candado por celda: peticiones simultáneas a una celda nueva esperan
+# a la primera en vez de consultar a la NASA cada una
+_candados = {}
+
+# Último estado conocido de NASA POWER (lo reporta /health/ready)
+estado_upstream = {
+    "ultimo_exito": None,
+    "ultimo_error": None,
+    "detalle_error": None,
+    "errores_consecutivos": 0,
+}
+
+
+def celda_nasa(lat: float, lon: float) -> str:
+    """
+    Identificador de la celda de la malla NASA POWER que contiene el punto.
+    Los puntos de la malla están centrados en múltiplos de PASO_LAT/PASO_LON,
+    así que se redondea al centro más cercano (no floor, que partiría cada celda).
+    """
+    fila = round((lat + 90.0) / PASO_LAT)
+    columna = round((lon + 180.0) / PASO_LON)
+    return f"r{fila}_c{columna}"
+
+
+def registrar_exito_upstream():
+    estado_upstream["ultimo_exito"] = datetime.now().isoformat()
+    estado_upstream["errores_consecutivos"] = 0
+
+
+def registrar_error_upstream(detalle):
+    estado_upstream["ultimo_error"] = datetime.now().isoformat()
+    estado_upstream["detalle_error"] = str(detalle)
+    estado_upstream["errores_consecutivos"] += 1
+
+
+def tamano_cache_climatologia() -> int:
+    return len(_cache_climatologia)
+
 
 async def obtener_datos_nasa(lat: float, lon: float) -> DatosClimaticos:
     """
     Consulta la API de la NASA POWER para obtener temperaturas de diseño.
+    El resultado se guarda por celda de la malla NASA, así que puntos
+    cercanos reutilizan la misma consulta.
     """
+    celda = celda_nasa(lat, lon)
+    if celda not in _cache_climatologia:
+        candado = _candados.setdefault(celda, asyncio.Lock())
+        async with candado:
+            # Otra petición pudo haberla consultado mientras esperábamos
+            if celda not in _cache_climatologia:
+                _cache_climatologia[celda] = await _consultar_climatologia(lat, lon)
+        # Ya en caché: las peticiones nuevas no llegan al candado
+        _candados.pop(celda, None)
+
+    temp_min_diseno, temp_max_pico = _cache_climatologia[celda]
+    return DatosClimaticos(
+        temperatura_minima_historica=temp_min_diseno,
+        temperatura_maxima_promedio=temp_max_pico,
+        ubicacion_validada=f"Lat: {lat}, Lon: {lon}"
+    )
+
+
+async def _consultar_climatologia(lat: float, lon: float):
+    """Devuelve (temp_min_diseno, temp_max_pico) de la climatología mensual NASA."""
     params = {
         "parameters": "T2M_MAX,T2M_MIN", # Pedimos Máximas y Mínimas
         "community": "RE",               # Renewable Energy
@@ -23,9 +96,12 @@ async def obtener_datos_nasa(lat: float, lon: float) -> DatosClimaticos:
             response.raise_for_status()
             data = response.json()
         except httpx.RequestError as e:
+            registrar_error_upstream(e)
             raise HTTPException(status_code=503, detail=f"Error conectando con NASA: {e}")
         except httpx.HTTPStatusError as e:
+            registrar_error_upstream(e)
             raise HTTPException(status_code=response.status_code, detail="NASA API Error")
+    registrar_exito_upstream()
 
     try:
         # La NASA devuelve promedios mensuales (JAN a DEC) y un anual (ANN).
@@ -47,11 +123,7 @@ async def obtener_datos_nasa(lat: float, lon: float) -> DatosClimaticos:
         # Algunos ingenieros restan 2-3°C extra a la mínima por olas de frío atípicas.
         temp_min_diseno = temp_min_absoluta - 2.0 
 
-        return DatosClimaticos(
-            temperatura_minima_historica=round(temp_min_diseno, 2),
-            temperatura_maxima_promedio=round(temp_max_pico, 2),
-            ubicacion_validada=f"Lat: {lat}, Lon: {lon}"
-        )
+        return round(temp_min_diseno, 2), round(temp_max_pico, 2)
 
     except KeyError:
         raise HTTPException(status_code=500, detail="Estructura de datos NASA inesperada")
@@ -0,0 +1,98 @@
+# loadtest/fake_nasa.py
+"""
+Servidor falso de NASA POWER para pruebas de carga.
+
+Responde con la misma estructura JSON que la API real, con latencia y tasa
+de error configurables por variables de entorno:
+
+    FAKE_NASA_LATENCIA_MS   Latencia media por respuesta (default 150)
+    FAKE_NASA_JITTER_MS     Variación uniforme +/- sobre la latencia (default 50)
+    FAKE_NASA_TASA_ERROR    Fracción de respuestas con HTTP 503 (default 0.0)
+    FAKE_NASA_SEMILLA       Semilla del generador aleatorio (default 42)
+
+Uso:
+    FAKE_NASA_LATENCIA_MS=300 uvicorn loadtest.fake_nasa:app --port 8900
+"""
+import asyncio
+import os
+import random
+from datetime import date
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query
+
+LATENCIA_MS = float(os.getenv("FAKE_NASA_LATENCIA_MS", "150"))
+JITTER_MS = float(os.getenv("FAKE_NASA_JITTER_MS", "50"))
+TASA_ERROR = float(os.getenv("FAKE_NASA_TASA_ERROR", "0.0"))
+
+MESES = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+_rng = random.Random(int(os.getenv("FAKE_NASA_SEMILLA", "42")))
+
+app = FastAPI(title="NASA POWER (falso)")
+
+
+async def _simular_upstream():
+    # Latencia y errores aleatorios, pero reproducibles para una misma semilla
+    latencia = max(0.0, LATENCIA_MS + _rng.uniform(-JITTER_MS, JITTER_MS))
+    await asyncio.sleep(latencia / 1000.0)
+    if _rng.random() < TASA_ERROR:
+        raise HTTPException(status_code=503, detail="Fake NASA: servicio no disponible")
+
+
+def _temperaturas_mensuales(lat: float, lon: float):
+    # Temperaturas deterministas por ubicación: más frío lejos del ecuador
+    base = 30.0 - abs(lat) * 0.6 + (lon % 5) * 0.2
+    t_max = {m: round(base + 6 - abs(i - 6) * 1.2, 2) for i, m in enumerate(MESES)}
+    t_min = {m: round(base - 12 - abs(i - 6) * 1.5, 2) for i, m in enumerate(MESES)}
+    t_max["ANN"] = round(sum(t_max[m] for m in MESES) / 12, 2)
+    t_min["ANN"] = round(sum(t_min[m] for m in MESES) / 12, 2)
+    return t_max, t_min
+
+
+@app.get("/api/temporal/climatology/point")
+async def climatologia(
+    latitude: float = Query(...),
+    longitude: float = Query(...),
+    parameters: str = Query("T2M_MAX,T2M_MIN"),
+):
+    await _simular_upstream()
+    t_max, t_min = _temperaturas_mensuales(latitude, longitude)
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": {"parameter": {"T2M_MAX": t_max, "T2M_MIN": t_min}},
+    }
+
+
+@app.get("/api/temporal/daily/point")
+async def diario(
+    latitude: float = Query(...),
+    longitude: float = Query(...),
+    start: str = Query(...),
+    end: str = Query(...),
+    parameters: str = Query("T2M_MAX,T2M_MIN"),
+):
+    await _simular_upstream()
+    inicio = date(int(start[:4]), int(start[4:6]), int(start[6:]))
+    fin = date(int(end[:4]), int(end[4:6]), int(end[6:]))
+    dias = np.arange(np.datetime64(inicio), np.datetime64(fin) + 1)
+
+    # Serie sintética: ciclo estacional + ruido, determinista por ubicación
+    rng = np.random.default_rng(abs(hash((round(latitude, 2), round(longitude, 2)))) % 2**32)
+    t_max_mes, t_min_mes = _temperaturas_mensuales(latitude, longitude)
+    meses = dias.astype("datetime64[M]").astype(int) % 12
+    base_max = np.array([t_max_mes[m] for m in MESES])[meses]
+    base_min = np.array([t_min_mes[m] for m in MESES])[meses]
+    t_max = np.round(base_max + rng.normal(0, 2.5, dias.size), 2)
+    t_min = np.round(base_min + rng.normal(0, 3.0, dias.size), 2)
+
+    fechas = [d.strftime("%Y%m%d") for d in dias.astype(date)]
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": {"parameter": {
+            "T2M_MAX": dict(zip(fechas, t_max.tolist())),
+            "T2M_MIN": dict(zip(fechas, t_min.tolist())),
+        }},
+    }
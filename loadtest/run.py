@@ -0,0 +1,280 @@
+# loadtest/run.py
+"""
+Prueba de carga reproducible para app.main:app.
+
+Levanta (si no se indica --objetivo) un servidor falso de NASA POWER y una
+instancia de la API apuntando a él, y luego genera tráfico mixto hacia
+/api/v1/costear-proyecto y /api/v1/clima con concurrencia controlada.
+Por cada nivel de concurrencia reporta throughput y latencias p50/p95/p99,
+dibuja la curva de saturación en terminal y opcionalmente la guarda en CSV.
+
+Ejemplos:
+    python -m loadtest.run
+    python -m loadtest.run --concurrencias 1,4,16,64 --duracion 20 --latencia-nasa-ms 400
+    python -m loadtest.run --tasa-error-nasa 0.05 --csv resultados.csv
+    python -m loadtest.run --objetivo http://staging:8000 --concurrencias 8,16
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import httpx
+import numpy as np
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Proyecto base válido para el catálogo incluido en app/data
+PROYECTO_BASE = {
+    "nombre_proyecto": "Prueba de carga",
+    "coordenadas": "19.43, -99.13",
+    "seleccion_componentes": {"modelo_panel": "RS5J-630NBG", "modelo_inversor": "S5-GC50K"},
+    "diseno_dc": {
+        "paneles_por_serie": 16,
+        "numero_de_series": 6,
+        "segmentos": [{"tipo": "tubería", "longitud": 40}],
+    },
+    "diseno_ac": {
+        "numero_de_inversores": 1,
+        "segmentos": [{"tipo": "charola", "longitud": 30}],
+    },
+    "decision_interconexion": {"punto_conexion_elegido": "Tablero Principal"},
+}
+
+
+# ------------------------------------------------
+# Generación de tráfico
+# ------------------------------------------------
+
+def generar_ubicaciones(n, rng):
+    # Puntos dentro de la República Mexicana
+    return [(round(rng.uniform(15.0, 32.0), 2), round(rng.uniform(-117.0, -87.0), 2)) for _ in range(n)]
+
+
+def construir_peticion(rng, ubicaciones, fraccion_clima):
+    lat, lon = rng.choice(ubicaciones)
+    if rng.random() < fraccion_clima:
+        return "clima", "GET", "/api/v1/clima", {"params": {"lat": lat, "lon": lon}}
+
+    proyecto = {**PROYECTO_BASE, "coordenadas": f"{lat}, {lon}"}
+    proyecto["diseno_dc"] = {
+        **PROYECTO_BASE["diseno_dc"],
+        "paneles_por_serie": rng.randint(14, 18),
+        "numero_de_series": rng.randint(2, 8),
+    }
+    return "costeo", "POST", "/api/v1/costear-proyecto", {"json": proyecto}
+
+
+async def _trabajador(cliente, rng, ubicaciones, fraccion_clima, fin, muestras):
+    while time.perf_counter() < fin:
+        tipo, metodo, ruta, kwargs = construir_peticion(rng, ubicaciones, fraccion_clima)
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, ruta, **kwargs)
+            estatus = respuesta.status_code
+        except httpx.HTTPError:
+            estatus = 0
+        muestras.append((tipo, time.perf_counter() - inicio, estatus))
+
+
+async def medir_nivel(url, concurrencia, duracion, fraccion_clima, ubicaciones, semilla):
+    muestras = []
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60.0) as cliente:
+        inicio = time.perf_counter()
+        fin = inicio + duracion
+        await asyncio.gather(*[
+            _trabajador(cliente, random.Random(semilla * 1000 + i), ubicaciones, fraccion_clima, fin, muestras)
+            for i in range(concurrencia)
+        ])
+        transcurrido = time.perf_counter() - inicio
+    return resumir(concurrencia, muestras, transcurrido)
+
+
+def resumir(concurrencia, muestras, transcurrido):
+    latencias = np.array([m[1] for m in muestras]) * 1000.0
+    exitos = sum(1 for m in muestras if 200 <= m[2] < 400)
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) if len(latencias) else (0.0, 0.0, 0.0)
+    return {
+        "concurrencia": concurrencia,
+        "peticiones": len(muestras),
+        "errores": len(muestras) - exitos,
+        "rps": exitos / transcurrido if transcurrido else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "costeo": sum(1 for m in muestras if m[0] == "costeo"),
+        "clima": sum(1 for m in muestras if m[0] == "clima"),
+    }
+
+
+# ------------------------------------------------
+# Reporte
+# ------------------------------------------------
+
+def detectar_saturacion(resultados, umbral_p99_ms, ganancia_minima=0.10):
+    """
+    Primer nivel donde el throughput deja de crecer (< ganancia_minima
+    respecto al nivel anterior) o el p99 rebasa el umbral.
+    """
+    for i, actual in enumerate(resultados):
+        if actual["p99_ms"] > umbral_p99_ms:
+            return actual["concurrencia"]
+        anterior = resultados[i - 1] if i else None
+        if anterior and anterior["rps"] and actual["rps"] < anterior["rps"] * (1 + ganancia_minima):
+            return actual["concurrencia"]
+    return None
+
+
+def imprimir_tabla(resultados):
+    print(f"{'conc':>5} {'peticiones':>10} {'errores':>8} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in resultados:
+        print(f"{r['concurrencia']:>5} {r['peticiones']:>10} {r['errores']:>8} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+
+def imprimir_grafica(resultados, saturacion, ancho=40):
+    # Curva de saturación en ASCII: throughput (#) y p99 (=) por nivel
+    max_rps = max((r["rps"] for r in resultados), default=0) or 1
+    max_p99 = max((r["p99_ms"] for r in resultados), default=0) or 1
+    print("\nCurva de saturación  (# = rps, = = p99)")
+    for r in resultados:
+        marca = "  <-- saturación" if r["concurrencia"] == saturacion else ""
+        print(f"{r['concurrencia']:>5} | {'#' * int(ancho * r['rps'] / max_rps):<{ancho}} {r['rps']:.1f} rps{marca}")
+        print(f"{'':>5} | {'=' * int(ancho * r['p99_ms'] / max_p99):<{ancho}} {r['p99_ms']:.0f} ms")
+
+
+def guardar_csv(resultados, ruta):
+    with open(ruta, "w", newline="") as f:
+        escritor = csv.DictWriter(f, fieldnames=list(resultados[0].keys()))
+        escritor.writeheader()
+        escritor.writerows(resultados)
+    print(f"\nResultados guardados en {ruta}")
+
+
+# ------------------------------------------------
+# Servidores locales (API + NASA falsa)
+# ------------------------------------------------
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar_puerto(url, timeout=30.0, exigir_200=False):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            respuesta = httpx.get(url, timeout=1.0)
+            if not exigir_200 or respuesta.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El servidor {url} no respondió en {timeout}s")
+
+
+@contextmanager
+def servidores_locales(args):
+    puerto_nasa, puerto_api = puerto_libre(), puerto_libre()
+    entorno_nasa = {
+        **os.environ,
+        "FAKE_NASA_LATENCIA_MS": str(args.latencia_nasa_ms),
+        "FAKE_NASA_JITTER_MS": str(args.jitter_nasa_ms),
+        "FAKE_NASA_TASA_ERROR": str(args.tasa_error_nasa),
+        "FAKE_NASA_SEMILLA": str(args.semilla),
+    }
+    entorno_api = {**os.environ, "NASA_POWER_BASE_URL": f"http://127.0.0.1:{puerto_nasa}"}
+    uvicorn = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+    # La API imprime trazas por cada error de NASA; solo se muestran con --verbose
+    salida_api = None if args.verbose else subprocess.DEVNULL
+
+    procesos = []
+    try:
+        procesos.append(subprocess.Popen(
+            uvicorn + ["loadtest.fake_nasa:app", "--port", str(puerto_nasa)], cwd=RAIZ_REPO, env=entorno_nasa))
+        procesos.append(subprocess.Popen(
+            uvicorn + ["app.main:app", "--port", str(puerto_api), "--workers", str(args.workers)],
+            cwd=RAIZ_REPO, env=entorno_api, stdout=salida_api, stderr=salida_api))
+        esperar_puerto(f"http://127.0.0.1:{puerto_nasa}/docs")
+        esperar_puerto(f"http://127.0.0.1:{puerto_api}/health/ready", exigir_200=True)
+        yield f"http://127.0.0.1:{puerto_api}"
+    finally:
+        for p in procesos:
+            p.terminate()
+        for p in procesos:
+            p.wait(timeout=10)
+
+
+# ------------------------------------------------
+# CLI
+# ------------------------------------------------
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del costeador")
+    parser.add_argument("--objetivo", help="URL de una API ya desplegada (omite los servidores locales)")
+    parser.add_argument("--concurrencias", default="1,2,4,8,16,32",
+                        help="Niveles de concurrencia separados por coma")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos por nivel")
+    parser.add_argument("--calentamiento", type=float, default=2.0, help="Segundos de calentamiento previos")
+    parser.add_argument("--fraccion-clima", type=float, default=0.3,
+                        help="Fracción de peticiones a /api/v1/clima (el resto a costear-proyecto)")
+    parser.add_argument("--ubicaciones", type=int, default=50, help="Número de ubicaciones distintas")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn para la API local")
+    parser.add_argument("--latencia-nasa-ms", type=float, default=150.0)
+    parser.add_argument("--jitter-nasa-ms", type=float, default=50.0)
+    parser.add_argument("--tasa-error-nasa", type=float, default=0.0)
+    parser.add_argument("--umbral-p99-ms", type=float, default=2000.0,
+                        help="p99 a partir del cual se considera saturado")
+    parser.add_argument("--csv", help="Ruta para guardar los resultados por nivel")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida de la API local")
+    return parser.parse_args(argv)
+
+
+async def ejecutar(url, args):
+    rng = random.Random(args.semilla)
+    ubicaciones = generar_ubicaciones(args.ubicaciones, rng)
+    niveles = [int(c) for c in args.concurrencias.split(",") if c.strip()]
+
+    if args.calentamiento > 0:
+        await medir_nivel(url, niveles[0], args.calentamiento, args.fraccion_clima, ubicaciones, args.semilla)
+
+    resultados = []
+    for concurrencia in niveles:
+        print(f"Midiendo concurrencia {concurrencia} durante {args.duracion:.0f}s...", flush=True)
+        resultados.append(await medir_nivel(
+            url, concurrencia, args.duracion, args.fraccion_clima, ubicaciones, args.semilla))
+    return resultados
+
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+
+    if args.objetivo:
+        resultados = asyncio.run(ejecutar(args.objetivo.rstrip("/"), args))
+    else:
+        with servidores_locales(args) as url:
+            resultados = asyncio.run(ejecutar(url, args))
+
+    print()
+    imprimir_tabla(resultados)
+    saturacion = detectar_saturacion(resultados, args.umbral_p99_ms)
+    imprimir_grafica(resultados, saturacion)
+    if saturacion:
+        print(f"\nPunto de saturación estimado: concurrencia {saturacion}")
+    else:
+        print("\nNo se detectó saturación en los niveles medidos")
+    if args.csv:
+        guardar_csv(resultados, args.csv)
+
+
+if __name__ == "__main__":
+    main()